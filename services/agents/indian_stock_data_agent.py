@@ -9,8 +9,13 @@ import aiohttp
 import json
 
 class IndianStockDataAgent(BaseStockAgent):
-    def __init__(self):
-        """Initialize the Indian Stock Data Agent"""
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, max_connections: int = 100):
+        """Initialize the Indian Stock Data Agent
+
+        Args:
+            session: Optional shared aiohttp session to reuse for NSE requests
+            max_connections: Connection pool size when the agent creates its own session
+        """
         super().__init__(
             name="Indian Stock Data Agent",
             description="Specializes in Indian stock market data from NSE and BSE, including prices, volumes, and technical indicators."
@@ -108,14 +113,18 @@ class IndianStockDataAgent(BaseStockAgent):
             'Upgrade-Insecure-Requests': '1',
             'Cache-Control': 'max-age=0'
         }
-        self.session = None
+        self.session = session
+        self.owns_session = session is None
+        self.max_connections = max_connections
         self.cookies = {}
 
     async def _init_session(self):
         """Initialize session with required cookies"""
         try:
             if not self.session:
-                self.session = aiohttp.ClientSession(headers=self.headers)
+                connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+                self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+                self.owns_session = True
             
             # Get cookies from main page
             async with self.session.get(self.base_url) as response:
@@ -312,8 +321,8 @@ class IndianStockDataAgent(BaseStockAgent):
             
             for symbol in stocks:
                 try:
-                    # Get stock data with retry logic
-                    stock, info, hist = self.get_stock_data_with_retry(symbol)
+                    # Get stock data with retry logic (off the event loop so sectors can run concurrently)
+                    stock, info, hist = await asyncio.to_thread(self.get_stock_data_with_retry, symbol)
                     
                     if not hist.empty:
                         # Calculate technical indicators
@@ -692,8 +701,13 @@ class IndianStockDataAgent(BaseStockAgent):
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
+        await self.close()
+
+    async def close(self):
+        """Close the NSE session if this agent created it"""
+        if self.session and self.owns_session:
             await self.session.close()
+            self.session = None
 
 if __name__ == "__main__":
     # Example usage
@@ -1,4 +1,5 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+import asyncio
 import yfinance as yf
 import pandas as pd
 from base_agent import BaseStockAgent
@@ -32,10 +33,8 @@ class StockDataAgent(BaseStockAgent):
             }
 
         try:
-            # Fetch stock data
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period="1y")
-            info = stock.info
+            # Fetch stock data in a worker thread so concurrent requests don't block each other
+            hist, info = await asyncio.to_thread(self._fetch_stock_data, symbol)
 
             # Prepare data for Claude's analysis
             data_context = {
@@ -110,6 +109,11 @@ Additional Context:
                 'analysis_type': 'stock_data'
             }
 
+    def _fetch_stock_data(self, symbol: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Fetch one year of history and the info dict for a symbol (blocking)"""
+        stock = yf.Ticker(symbol)
+        return stock.history(period="1y"), stock.info
+
     def _extract_symbol(self, request: str) -> Optional[str]:
         """Extract stock symbol from request"""
         # Basic implementation - could be enhanced with Claude's help
@@ -26,9 +26,9 @@ async def main():
         # Test individual sector analysis
         print("\n=== Testing Individual Sector Analysis ===")
         sectors_to_test = ['bank', 'it', 'auto']
-        for sector in sectors_to_test:
+        sector_results = await asyncio.gather(*(agent.analyze_sector(s) for s in sectors_to_test))
+        for sector, sector_analysis in zip(sectors_to_test, sector_results):
             print(f"\nAnalyzing {sector.upper()} sector...")
-            sector_analysis = await agent.analyze_sector(sector)
             if 'error' in sector_analysis:
                 print(f"Error: {sector_analysis['error']}")
             else:
@@ -8,10 +8,18 @@ async def test_scraper():
     # Test with a well-known stock
     test_symbols = ['AAPL', 'MSFT', 'GOOGL']
     
-    for symbol in test_symbols:
+    async def one(symbol):
+        return symbol, await agent.process_request(f"Analyze stock data for {symbol}")
+
+    # Fetch all symbols concurrently; wall-clock is the slowest symbol, not the sum
+    results = await asyncio.gather(*(one(s) for s in test_symbols), return_exceptions=True)
+
+    for symbol, outcome in zip(test_symbols, results):
         print(f"\nTesting scraper with {symbol}...")
         try:
-            result = await agent.process_request(f"Analyze stock data for {symbol}")
+            if isinstance(outcome, Exception):
+                raise outcome
+            _, result = outcome
             
             if 'error' in result:
                 print(f"Error: {result['error']}")
@@ -1,15 +1,27 @@
-from fastapi import Header, HTTPException, Depends
-from typing import Optional
+from fastapi import Header, HTTPException, Depends, Request
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
 import jwt
-from datetime import datetime, timedelta
+import time
+import json
+import hashlib
+import logging
 from functools import lru_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+import httpx
 import os
 from dotenv import load_dotenv
+from services.claude_service import ClaudeService
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Rate limit window in seconds
+_RATE_WINDOW = 3600
+
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 mongo_client: Optional[AsyncIOMotorClient] = None
@@ -42,6 +54,52 @@ async def close_redis_client():
         await redis_client.close()
         redis_client = None
 
+# Shared HTTP connection pool and Claude client. httpx defaults to a small pool,
+# which quietly serializes concurrent upstream calls under load.
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "50")),
+    keepalive_expiry=60
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+http_client: Optional[httpx.AsyncClient] = None
+claude_service: Optional[ClaudeService] = None
+
+async def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return http_client
+
+async def get_claude_service() -> ClaudeService:
+    global claude_service
+    if claude_service is None:
+        claude_service = ClaudeService(
+            http_client=await get_http_client(),
+            cache=await get_redis_client()
+        )
+    return claude_service
+
+async def close_claude_service():
+    global claude_service, http_client
+    claude_service = None
+    if http_client:
+        await http_client.aclose()
+        http_client = None
+
+# Agents are built once in the app lifespan and kept on app.state
+def get_orchestrator(request: Request):
+    """Get the stock analysis orchestrator created at startup"""
+    return request.app.state.orchestrator
+
+def get_indian_stock_agent(request: Request):
+    """Get the Indian stock data agent created at startup"""
+    return request.app.state.indian_stock_agent
+
+# Dependencies below are plain module-level functions (never per-route lambdas or
+# partials) so FastAPI's per-callable inspection cache stays warm across requests.
+
 async def verify_api_key(x_api_key: str = Header(...)):
     """Verify API key from headers"""
     if not x_api_key:
@@ -78,16 +136,87 @@ async def get_current_user(authorization: str = Header(...)):
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-def get_cached_analysis(symbol: str) -> Optional[dict]:
+# Cache-aside settings (seconds) per endpoint
+CACHE_TTLS = {
+    'analyze': 3600,
+    'historical': 3600,
+    'technical': 300,
+    'market-summary': 300,
+    'fundamentals': 3600
+}
+cache_stats = {'hits': 0, 'misses': 0}
+
+def make_cache_key(endpoint: str, symbol: str = "", params: Optional[dict] = None) -> str:
+    """Build a stable cache key from endpoint, symbol and request params"""
+    digest = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{endpoint}:{symbol}:{digest}"
+
+async def get_cached(key: str) -> Optional[dict]:
+    """Get a cached result, or None on a miss; an unreachable Redis counts as a miss"""
+    try:
+        redis = await get_redis_client()
+        cached = await redis.get(key)
+    except (RedisError, OSError) as e:
+        logger.warning("Cache read failed for %s: %s", key, e)
+        cached = None
+    if cached is None:
+        cache_stats['misses'] += 1
+        return None
+    cache_stats['hits'] += 1
+    return json.loads(cached)
+
+async def set_cached(key: str, value: dict, expire: int = 3600):
+    """Cache a result under key for expire seconds; skipped if Redis is unreachable"""
+    try:
+        redis = await get_redis_client()
+        await redis.set(key, json.dumps(value, default=str), ex=expire)
+    except (RedisError, OSError) as e:
+        logger.warning("Cache write failed for %s: %s", key, e)
+
+# In-flight computations by key, so concurrent cache misses share one result
+_inflight: Dict[str, asyncio.Task] = {}
+
+async def single_flight(key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Run compute once per key; concurrent callers with the same key await the same result"""
+    task = _inflight.get(key)
+    if task is None:
+        # The flight owns the task, not the first caller, so a cancelled caller
+        # doesn't cancel the computation everyone else is waiting on
+        task = asyncio.get_running_loop().create_task(compute())
+        _inflight[key] = task
+
+        def finish(done: asyncio.Task):
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            if not done.cancelled():
+                done.exception()  # mark retrieved in case every caller went away
+
+        task.add_done_callback(finish)
+
+    # Shield so a cancelled caller only stops waiting
+    return await asyncio.shield(task)
+
+async def cached_flight(key: str, ttl: int, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Cache-aside over single_flight: serve a cached result, else compute it once and cache it"""
+    cached = await get_cached(key)
+    if cached is not None:
+        return cached
+
+    async def compute_and_cache():
+        result = await compute()
+        # Write before the flight ends, so callers arriving next hit the cache instead of recomputing
+        await set_cached(key, result, ttl)
+        return result
+
+    return await single_flight(key, compute_and_cache)
+
+async def get_cached_analysis(symbol: str) -> Optional[dict]:
     """Get cached analysis result"""
-    redis = get_redis_client()
-    cached = redis.get(f"analysis:{symbol}")
-    return cached.decode() if cached else None
+    return await get_cached(f"analysis:{symbol}")
 
-def cache_analysis(symbol: str, result: dict, expire: int = 3600):
+async def cache_analysis(symbol: str, result: dict, expire: int = 3600):
     """Cache analysis result"""
-    redis = get_redis_client()
-    redis.setex(f"analysis:{symbol}", expire, str(result))
+    await set_cached(f"analysis:{symbol}", result, expire)
 
 async def get_rate_limit(api_key: str = Depends(verify_api_key)):
     """Get rate limit for API key"""
@@ -95,5 +224,57 @@ async def get_rate_limit(api_key: str = Depends(verify_api_key)):
     return {
         'limit': 100,
         'remaining': 95,
-        'reset': int((datetime.now() + timedelta(hours=1)).timestamp())
+        'reset': int(time.time()) + _RATE_WINDOW
     }
+
+class ClaudeLimiter:
+    """Token bucket bounding how fast this worker starts Claude calls"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take a token, waiting up to max_wait seconds; False if the queue is too deep"""
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            wait = (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                return False
+            # Reserve the token now so later callers queue behind this one
+            self.tokens -= 1
+        await asyncio.sleep(wait)
+        return True
+
+CLAUDE_RPS = float(os.getenv("CLAUDE_RPS", "5"))
+CLAUDE_MAX_WAIT = float(os.getenv("CLAUDE_MAX_WAIT", "2"))
+# Optional cap shared by all workers, enforced with a per-second Redis counter
+CLAUDE_GLOBAL_RPS = int(os.getenv("CLAUDE_GLOBAL_RPS", "0"))
+_claude_limiter = ClaudeLimiter(CLAUDE_RPS)
+
+async def claude_rate_limit():
+    """Reject Claude-backed requests with 429 instead of letting them queue unbounded"""
+    if not await _claude_limiter.acquire(CLAUDE_MAX_WAIT):
+        raise HTTPException(status_code=429, detail="Too many analysis requests", headers={"Retry-After": "1"})
+
+    if CLAUDE_GLOBAL_RPS:
+        key = f"ratelimit:claude:{int(time.time())}"
+        try:
+            redis = await get_redis_client()
+            count = await redis.incr(key)
+            if count == 1:
+                await redis.expire(key, 2)
+        except (RedisError, OSError) as e:
+            # Fall back to the per-worker limit rather than failing the request
+            logger.warning("Global Claude rate limit unavailable: %s", e)
+            return
+        if count > CLAUDE_GLOBAL_RPS:
+            raise HTTPException(status_code=429, detail="Too many analysis requests", headers={"Retry-After": "1"})
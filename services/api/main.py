@@ -1,36 +1,53 @@
-[INFO] Starting stock data collection task
-[INFO] Successfully collected stock data for 500 stocks
-[INFO] Starting sentiment analysis task
-[INFO] Completed sentiment analysis for AAPL
-[INFO] Starting stock evaluation task
-[INFO] Updated recommendations for 500 stocks
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+import os
 import time
 import uvicorn
 from routers import stock_analysis
-from dependencies import get_redis_client, get_mongo_client, close_redis_client, close_mongo_client
+from middleware.metrics import MetricsMiddleware
+from middleware.error_handler import ErrorHandler
+from agents.orchestrator import StockAnalysisOrchestrator
+from agents.indian_stock_data_agent import IndianStockDataAgent
+from dependencies import (
+    get_redis_client,
+    get_mongo_client,
+    get_claude_service,
+    close_redis_client,
+    close_mongo_client,
+    close_claude_service,
+    cache_stats
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await get_redis_client()
     await get_mongo_client()
+    app.state.claude_service = await get_claude_service()
+    app.state.orchestrator = StockAnalysisOrchestrator()
+    app.state.indian_stock_agent = IndianStockDataAgent()
     yield
     # Shutdown
+    await app.state.indian_stock_agent.close()
     await close_redis_client()
     await close_mongo_client()
+    await close_claude_service()
 
 app = FastAPI(
     title="Stock Analysis API",
     description="API for comprehensive stock analysis and recommendations",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Middleware added first sits innermost. ErrorHandler goes inside CORS and GZip so
+# its error responses still get CORS headers; metrics wrap everything.
+app.add_middleware(ErrorHandler)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -43,33 +60,22 @@ app.add_middleware(
 # Add Gzip compression
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Request metrics, timing header and per-request timestamp (pure ASGI middleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(stock_analysis.router)
 
-# Middleware for request timing
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-# Error handlers
+# Error handlers. Routes let unexpected errors propagate rather than each wrapping
+# its body in try/except; the ErrorHandler middleware turns them into
+# {"error": {...}} responses, while explicit HTTPExceptions keep their own status codes
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
     )
 
-@app.exception_handler(Exception)
-async def general_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
-        status_code=500,
-        content={"detail": "Internal server error"},
-    )
-
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -78,6 +84,15 @@ async def health_check():
         "timestamp": time.time()
     }
 
+# Cache hit/miss counters for this worker
+@app.get("/meta/cache-stats")
+async def get_cache_stats():
+    total = cache_stats['hits'] + cache_stats['misses']
+    return {
+        **cache_stats,
+        "hit_rate": cache_stats['hits'] / total if total else 0.0
+    }
+
 # API documentation endpoints are automatically generated by FastAPI
 
 if __name__ == "__main__":
@@ -85,6 +100,7 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        workers=4
+        loop="auto",  # uvloop when installed (not available on Windows)
+        http="httptools",
+        workers=os.cpu_count() or 1
     )
@@ -1,8 +1,10 @@
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
-from typing import Union, Dict, Any
+from typing import Dict, Any
 import traceback
+import uuid
 
 # Configure logging
 logging.basicConfig(
@@ -11,16 +13,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Only these request headers are copied into error logs
+_LOG_HEADERS = ("user-agent", "x-request-id", "x-forwarded-for")
+
 class ErrorHandler:
-    async def catch_exceptions_middleware(
-        self,
-        request: Request,
-        call_next
-    ) -> Union[JSONResponse, Any]:
+    """Pure ASGI middleware turning unhandled exceptions into JSON errors"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            return await self.handle_exception(request, e)
+            # Too late to replace a response that is already on the wire
+            if response_started:
+                raise
+            response = await self.handle_exception(Request(scope), e)
+            await response(scope, receive, send)
 
     async def handle_exception(
         self,
@@ -42,13 +63,13 @@ class ErrorHandler:
         )
 
     def log_error(self, request: Request, exc: Exception) -> str:
-        error_id = str(id(exc))
+        error_id = uuid.uuid4().hex
         
         error_details = {
             'error_id': error_id,
-            'url': str(request.url),
+            'path': request.url.path,
             'method': request.method,
-            'headers': dict(request.headers),
+            'headers': {h: request.headers.get(h) for h in _LOG_HEADERS if h in request.headers},
             'error_type': type(exc).__name__,
             'error_message': str(exc),
             'traceback': traceback.format_exc()
@@ -1,7 +1,8 @@
 from prometheus_client import Counter, Histogram, Gauge
 import time
-from fastapi import Request
-from typing import Callable
+from datetime import datetime
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import psutil
 
 # Request metrics
@@ -45,48 +46,59 @@ ACTIVE_CONNECTIONS = Gauge(
 )
 
 class MetricsMiddleware:
-    def __init__(self):
+    """
+    Pure ASGI middleware recording request count and latency. It also sets the
+    X-Process-Time header and stamps request.state.now / iso_now once, so handlers
+    share a single timestamp instead of calling datetime.now() repeatedly.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.start_time = time.time()
         self.update_system_metrics()
 
-    async def metrics_middleware(
-        self,
-        request: Request,
-        call_next: Callable
-    ):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # Record start time
-        start_time = time.time()
-        
+        start_time = time.perf_counter()
+        now = datetime.now()
+        state = scope.setdefault("state", {})
+        state["now"] = now
+        state["iso_now"] = now.isoformat()
+
         # Get the route path for the metric labels
-        route = request.url.path
-        method = request.method
+        route = scope["path"]
+        method = scope["method"]
+        status_holder = [500]
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
 
         try:
             # Process the request
-            response = await call_next(request)
-
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # Record failed requests
+            status_holder[0] = 500
+            raise
+        finally:
             # Record metrics
             REQUEST_COUNT.labels(
                 method=method,
                 endpoint=route,
-                status=response.status_code
+                status=status_holder[0]
             ).inc()
 
             REQUEST_LATENCY.labels(
                 method=method,
                 endpoint=route
-            ).observe(time.time() - start_time)
-
-            return response
-
-        except Exception as exc:
-            # Record failed requests
-            REQUEST_COUNT.labels(
-                method=method,
-                endpoint=route,
-                status=500
-            ).inc()
-            raise exc
+            ).observe(time.perf_counter() - start_time)
 
     def update_system_metrics(self):
         """Update system metrics periodically"""
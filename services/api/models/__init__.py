@@ -1,6 +1,26 @@
+from .stock import (
+    StockAnalysisRequest,
+    BatchAnalysisRequest,
+    HistoricalDataRequest,
+    TechnicalIndicatorRequest,
+    SentimentAnalysisRequest,
+    WatchlistRequest,
+    AlertRequest,
+    AnalysisResponse,
+    ErrorResponse
+)
 from .indian_stock import IndianStockRequest, IndianStockResponse, IndianMarketSummary
 
 __all__ = [
+    'StockAnalysisRequest',
+    'BatchAnalysisRequest',
+    'HistoricalDataRequest',
+    'TechnicalIndicatorRequest',
+    'SentimentAnalysisRequest',
+    'WatchlistRequest',
+    'AlertRequest',
+    'AnalysisResponse',
+    'ErrorResponse',
     'IndianStockRequest',
     'IndianStockResponse',
     'IndianMarketSummary'
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from typing import Optional, Dict, Any
 
@@ -10,6 +10,8 @@ class IndianStockRequest(BaseModel):
     include_growth: bool = True
 
 class IndianStockResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     symbol: str
     exchange: str
     current_price: str
@@ -24,6 +26,8 @@ class IndianStockResponse(BaseModel):
     status: str
 
 class IndianMarketSummary(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     nifty50: Dict[str, Any]
     sensex: Dict[str, Any]
     market_analysis: str
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Literal, Optional, Any
 from datetime import datetime
 
 class StockAnalysisRequest(BaseModel):
@@ -8,6 +8,12 @@ class StockAnalysisRequest(BaseModel):
     include_sentiment: bool = Field(True, description="Include sentiment analysis")
     include_growth: bool = Field(True, description="Include growth analysis")
 
+class BatchAnalysisRequest(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=50, description="Stock symbols to analyze")
+    include_technical: bool = Field(True, description="Include technical analysis")
+    include_sentiment: bool = Field(True, description="Include sentiment analysis")
+    include_growth: bool = Field(True, description="Include growth analysis")
+
 class HistoricalDataRequest(BaseModel):
     symbol: str = Field(..., description="Stock symbol")
     start_date: datetime = Field(..., description="Start date for historical data")
@@ -23,6 +29,7 @@ class SentimentAnalysisRequest(BaseModel):
     symbol: str = Field(..., description="Stock symbol")
     sources: List[str] = Field(["twitter", "reddit", "news"], description="Sources for sentiment analysis")
     timeframe: str = Field("24h", description="Timeframe for sentiment analysis")
+    mode: Literal["claude", "traditional", "both"] = Field("both", description="Sentiment engine(s) to run")
 
 class WatchlistRequest(BaseModel):
     symbols: List[str] = Field(..., description="List of stock symbols to watch")
@@ -35,6 +42,8 @@ class AlertRequest(BaseModel):
     user_id: str = Field(..., description="User ID for alert")
 
 class AnalysisResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     status: str
     symbol: str
     timestamp: datetime
@@ -44,6 +53,8 @@ class AnalysisResponse(BaseModel):
     growth_analysis: Optional[Dict[str, Any]]
 
 class ErrorResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     status: str = "error"
     message: str
     code: int
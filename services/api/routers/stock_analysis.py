@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from typing import List, Optional
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 from ..models import (
     StockAnalysisRequest,
+    BatchAnalysisRequest,
     HistoricalDataRequest,
     TechnicalIndicatorRequest,
     SentimentAnalysisRequest,
@@ -18,64 +23,168 @@ from ..dependencies import (
     verify_api_key,
     get_current_user,
     get_rate_limit,
+    claude_rate_limit,
     get_cached_analysis,
-    cache_analysis
+    cache_analysis,
+    get_claude_service,
+    get_orchestrator,
+    get_indian_stock_agent,
+    get_cached,
+    set_cached,
+    make_cache_key,
+    single_flight,
+    cached_flight,
+    CACHE_TTLS
 )
 from ...agents.orchestrator import StockAnalysisOrchestrator
 from ...agents.indian_stock_data_agent import IndianStockDataAgent
 from ..services.claude_service import ClaudeService
 
 router = APIRouter(prefix="/api/v1/stock", tags=["stock"])
-orchestrator = StockAnalysisOrchestrator()
-indian_stock_agent = IndianStockDataAgent()
-claude_service = ClaudeService()
+logger = logging.getLogger(__name__)
+
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format one server-sent event"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+def _stream_analysis(
+    header: dict,
+    text_stream: AsyncIterator[str],
+    trailer: Optional[Tuple[str, asyncio.Task]] = None
+) -> StreamingResponse:
+    """
+    Stream a JSON context event, then Claude's text as it arrives, then an optional
+    trailing result, then a done event. A failure ends the stream with an error event.
+    """
+    async def body():
+        try:
+            yield _sse_event(json.dumps(header, default=str), event="context")
+            async for text in text_stream:
+                yield _sse_event(text)
+            if trailer is not None:
+                name, task = trailer
+                yield _sse_event(json.dumps(await task, default=str), event=name)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error("Error while streaming analysis: %s", e, exc_info=True)
+            yield _sse_event(json.dumps({"error": str(e)}), event="error")
+            return
+        finally:
+            if trailer is not None:
+                trailer[1].cancel()
+        yield _sse_event("", event="done")
+
+    return StreamingResponse(body(), media_type="text/event-stream")
+
+async def _none() -> None:
+    """Placeholder awaitable for an analysis that wasn't requested"""
+    return None
+
+# Upper bound on concurrent orchestrator runs per batch request
+BATCH_CONCURRENCY = 8
+
+async def _analyze_symbol(
+    request: StockAnalysisRequest,
+    orchestrator: StockAnalysisOrchestrator,
+    now: datetime,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> AnalysisResponse:
+    """Analyze one symbol through the cache; only cache misses take a semaphore slot"""
+    # The include_* flags change the result, so they are part of the key
+    key = make_cache_key('analyze', request.symbol, request.model_dump())
+
+    # Check cache first
+    result = await get_cached(key)
+    if result is None:
+        async def compute():
+            # Perform analysis
+            result = await orchestrator.analyze_stock(
+                request.symbol,
+                include_technical=request.include_technical,
+                include_sentiment=request.include_sentiment,
+                include_growth=request.include_growth
+            )
+
+            # Cache the orchestrator output; the response envelope is rebuilt per request
+            await set_cached(key, result, CACHE_TTLS['analyze'])
+            return result
+
+        # Concurrent misses for the same request share one computation
+        if semaphore is None:
+            result = await single_flight(key, compute)
+        else:
+            async with semaphore:
+                result = await single_flight(key, compute)
+
+    # Orchestrator output is trusted, so skip per-field validation
+    return AnalysisResponse.model_construct(
+        status="success",
+        symbol=request.symbol,
+        timestamp=now,
+        **result
+    )
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_stock(
     request: StockAnalysisRequest,
-    background_tasks: BackgroundTasks,
+    http_request: Request,
     api_key: str = Depends(verify_api_key),
-    rate_limit: dict = Depends(get_rate_limit)
+    rate_limit: dict = Depends(get_rate_limit),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
     Analyze a stock and provide comprehensive insights
     """
-    try:
-        # Check cache first
-        cached_result = get_cached_analysis(request.symbol)
-        if cached_result:
-            return AnalysisResponse(**cached_result)
-
-        # Perform analysis
-        result = await orchestrator.analyze_stock(
-            request.symbol,
-            include_technical=request.include_technical,
-            include_sentiment=request.include_sentiment,
-            include_growth=request.include_growth
-        )
-
-        # Cache result in background
-        background_tasks.add_task(cache_analysis, request.symbol, result)
+    return await _analyze_symbol(request, orchestrator, http_request.state.now)
 
-        return AnalysisResponse(
-            status="success",
-            symbol=request.symbol,
-            timestamp=datetime.now(),
-            **result
-        )
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.post("/analyze/batch", response_model=dict)
+async def analyze_stock_batch(
+    request: BatchAnalysisRequest,
+    http_request: Request,
+    api_key: str = Depends(verify_api_key),
+    rate_limit: dict = Depends(get_rate_limit),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
+):
+    """
+    Analyze several stocks in one call, running at most BATCH_CONCURRENCY analyses at a time
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    options = request.model_dump(exclude={'symbols'})
+    results = await asyncio.gather(
+        *(
+            _analyze_symbol(StockAnalysisRequest(symbol=symbol, **options), orchestrator, http_request.state.now, semaphore)
+            for symbol in request.symbols
+        ),
+        return_exceptions=True
+    )
+
+    return {
+        'status': 'success',
+        'results': {
+            symbol: (
+                {'status': 'error', 'message': str(result)}
+                if isinstance(result, Exception)
+                else result.model_dump()
+            )
+            for symbol, result in zip(request.symbols, results)
+        },
+        'timestamp': http_request.state.iso_now
+    }
 
 @router.get("/historical", response_model=dict)
 async def get_historical_data(
     request: HistoricalDataRequest,
-    api_key: str = Depends(verify_api_key)
+    api_key: str = Depends(verify_api_key),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
     Get historical stock data
     """
-    try:
+    cache_key = make_cache_key('historical', request.symbol, request.model_dump())
+
+    async def compute():
         result = await orchestrator.stock_agent.process({
             'action': 'historical_data',
             'symbol': request.symbol,
@@ -85,18 +194,21 @@ async def get_historical_data(
         })
         return result
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Served from cache; concurrent misses for the same key share one computation
+    return await cached_flight(cache_key, CACHE_TTLS['historical'], compute)
 
 @router.post("/technical", response_model=dict)
 async def calculate_technical_indicators(
     request: TechnicalIndicatorRequest,
-    api_key: str = Depends(verify_api_key)
+    api_key: str = Depends(verify_api_key),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
     Calculate technical indicators for a stock
     """
-    try:
+    cache_key = make_cache_key('technical', request.symbol, request.model_dump())
+
+    async def compute():
         result = await orchestrator.stock_agent.process({
             'action': 'technical_indicators',
             'symbol': request.symbol,
@@ -105,57 +217,101 @@ async def calculate_technical_indicators(
         })
         return result
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Served from cache; concurrent misses for the same key share one computation
+    return await cached_flight(cache_key, CACHE_TTLS['technical'], compute)
 
 @router.post("/sentiment", response_model=dict)
 async def analyze_sentiment(
     request: SentimentAnalysisRequest,
-    api_key: str = Depends(verify_api_key)
+    http_request: Request,
+    stream: bool = False,
+    api_key: str = Depends(verify_api_key),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
-    Analyze sentiment for a stock using Claude's advanced NLP capabilities
+    Analyze sentiment for a stock using Claude's advanced NLP capabilities.
+    With stream=true (mode 'claude' or 'both'), Claude's analysis is sent as server-sent events.
     """
-    try:
-        # Get news and financial data
-        news_data = await orchestrator.sentiment_agent.process({
+    use_claude = request.mode in ("claude", "both")
+    use_traditional = request.mode in ("traditional", "both")
+    if stream and not use_claude:
+        # Only Claude's analysis is streamed; don't quietly fall back to plain JSON
+        raise HTTPException(status_code=400, detail="stream=true requires mode 'claude' or 'both'")
+
+    # None of these depend on each other, so start the requested ones at once
+    tasks = []
+    if use_claude:
+        # Only Claude-backed modes need the Claude service or spend a rate-limit slot
+        await claude_rate_limit()
+        claude_service = await get_claude_service()
+        news_task = asyncio.create_task(orchestrator.sentiment_agent.process({
             'action': 'fetch_news',
             'symbol': request.symbol,
             'timeframe': request.timeframe
-        })
-        
-        financial_data = await orchestrator.stock_agent.process({
+        }))
+        financial_task = asyncio.create_task(orchestrator.stock_agent.process({
             'action': 'get_financials',
             'symbol': request.symbol
-        })
-
-        # Use Claude for advanced sentiment analysis
-        claude_analysis = await claude_service.analyze_stock_sentiment(
-            company_name=request.symbol,
-            news_data=news_data,
-            financial_data=financial_data
-        )
-
-        # Combine with traditional sentiment analysis
-        traditional_analysis = await orchestrator.sentiment_agent.process({
+        }))
+        tasks += [news_task, financial_task]
+    traditional_task = None
+    if use_traditional:
+        traditional_task = asyncio.create_task(orchestrator.sentiment_agent.process({
             'action': 'analyze',
             'symbol': request.symbol,
             'sources': request.sources,
             'timeframe': request.timeframe
-        })
+        }))
+        tasks.append(traditional_task)
+
+    try:
+        claude_task = None
+
+        if use_claude:
+            # Get news and financial data
+            news_data, financial_data = await asyncio.gather(news_task, financial_task)
+
+            if stream:
+                return _stream_analysis(
+                    {'symbol': request.symbol, 'timestamp': http_request.state.iso_now},
+                    claude_service.stream_stock_sentiment(
+                        company_name=request.symbol,
+                        news_data=news_data,
+                        financial_data=financial_data
+                    ),
+                    trailer=('traditional_analysis', traditional_task) if traditional_task else None
+                )
+
+            # Start Claude as soon as its inputs are ready; the traditional
+            # analysis keeps running alongside it
+            claude_task = asyncio.create_task(claude_service.analyze_stock_sentiment(
+                company_name=request.symbol,
+                news_data=news_data,
+                financial_data=financial_data
+            ))
+            tasks.append(claude_task)
+
+        claude_analysis, traditional_analysis = await asyncio.gather(
+            claude_task or _none(),
+            traditional_task or _none()
+        )
 
         # Merge both analyses
         result = {
             'claude_analysis': claude_analysis,
             'traditional_analysis': traditional_analysis,
-            'timestamp': datetime.now().isoformat(),
-            'symbol': request.symbol
+            'timestamp': http_request.state.iso_now,
+            'symbol': request.symbol,
+            'mode': request.mode
         }
 
         return result
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except Exception:
+        # Don't leave sibling fetches running after a failure
+        for task in tasks:
+            task.cancel()
+        raise
 
 @router.post("/watchlist", response_model=dict)
 async def manage_watchlist(
@@ -165,16 +321,12 @@ async def manage_watchlist(
     """
     Manage user's stock watchlist
     """
-    try:
-        # Implement watchlist management
-        return {
-            'status': 'success',
-            'message': 'Watchlist updated',
-            'symbols': request.symbols
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Implement watchlist management
+    return {
+        'status': 'success',
+        'message': 'Watchlist updated',
+        'symbols': request.symbols
+    }
 
 @router.post("/alert", response_model=dict)
 async def set_alert(
@@ -184,43 +336,66 @@ async def set_alert(
     """
     Set price alert for a stock
     """
-    try:
-        # Implement alert setting
-        return {
-            'status': 'success',
-            'message': 'Alert set successfully',
-            'alert': {
-                'symbol': request.symbol,
-                'condition': request.condition,
-                'value': request.value
-            }
+    # Implement alert setting
+    return {
+        'status': 'success',
+        'message': 'Alert set successfully',
+        'alert': {
+            'symbol': request.symbol,
+            'condition': request.condition,
+            'value': request.value
         }
+    }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def _fetch_market_data(orchestrator: StockAnalysisOrchestrator) -> Tuple[dict, dict, dict]:
+    """Get market data, economic indicators and global events concurrently"""
+    return await asyncio.gather(
+        orchestrator.stock_agent.process({
+            'action': 'market_summary'
+        }),
+        orchestrator.stock_agent.process({
+            'action': 'economic_indicators'
+        }),
+        orchestrator.sentiment_agent.process({
+            'action': 'global_events'
+        })
+    )
 
 @router.get("/market-summary", response_model=dict)
 async def get_market_summary(
-    api_key: str = Depends(verify_api_key)
+    http_request: Request,
+    stream: bool = False,
+    api_key: str = Depends(verify_api_key),
+    claude_service: ClaudeService = Depends(get_claude_service),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
-    Get comprehensive market summary using Claude's analysis
+    Get comprehensive market summary using Claude's analysis.
+    With stream=true, Claude's insights are sent as server-sent events.
     """
-    try:
-        # Get market data
-        market_data = await orchestrator.stock_agent.process({
-            'action': 'market_summary'
-        })
+    if stream:
+        await claude_rate_limit()
+        market_data, economic_data, global_events = await _fetch_market_data(orchestrator)
+        return _stream_analysis(
+            {
+                'market_data': market_data,
+                'economic_indicators': economic_data,
+                'global_events': global_events,
+                'timestamp': http_request.state.iso_now
+            },
+            claude_service.stream_market_insights(
+                market_data=market_data,
+                economic_indicators=economic_data,
+                global_events=global_events
+            )
+        )
 
-        # Get economic indicators
-        economic_data = await orchestrator.stock_agent.process({
-            'action': 'economic_indicators'
-        })
+    cache_key = make_cache_key('market-summary')
 
-        # Get global events
-        global_events = await orchestrator.sentiment_agent.process({
-            'action': 'global_events'
-        })
+    async def compute():
+        # Cache hits never reach Claude, so only a miss takes a rate-limit slot
+        await claude_rate_limit()
+        market_data, economic_data, global_events = await _fetch_market_data(orchestrator)
 
         # Get Claude's market insights
         claude_insights = await claude_service.generate_market_insights(
@@ -235,46 +410,84 @@ async def get_market_summary(
             'economic_indicators': economic_data,
             'global_events': global_events,
             'claude_insights': claude_insights,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': http_request.state.iso_now
         }
 
         return result
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Served from cache; concurrent misses share one computation
+    return await cached_flight(cache_key, CACHE_TTLS['market-summary'], compute)
+
+async def _fetch_fundamental_data(orchestrator: StockAnalysisOrchestrator, symbol: str) -> Tuple[dict, dict, dict]:
+    """Get company, industry and competitor data concurrently"""
+    return await asyncio.gather(
+        orchestrator.stock_agent.process({
+            'action': 'company_fundamentals',
+            'symbol': symbol
+        }),
+        orchestrator.stock_agent.process({
+            'action': 'industry_metrics',
+            'symbol': symbol
+        }),
+        orchestrator.stock_agent.process({
+            'action': 'competitor_analysis',
+            'symbol': symbol
+        })
+    )
 
 @router.post("/fundamentals/{symbol}", response_model=dict)
 async def analyze_fundamentals(
     symbol: str,
-    api_key: str = Depends(verify_api_key)
+    http_request: Request,
+    stream: bool = False,
+    deep: bool = False,
+    api_key: str = Depends(verify_api_key),
+    claude_service: ClaudeService = Depends(get_claude_service),
+    orchestrator: StockAnalysisOrchestrator = Depends(get_orchestrator)
 ):
     """
-    Get comprehensive fundamental analysis using Claude
+    Get comprehensive fundamental analysis using Claude.
+    With stream=true, Claude's analysis is sent as server-sent events.
+    With deep=true, the analysis uses a larger model.
     """
-    try:
-        # Get company data
-        company_data = await orchestrator.stock_agent.process({
-            'action': 'company_fundamentals',
-            'symbol': symbol
-        })
+    if stream:
+        await claude_rate_limit()
+        company_data, industry_data, competitor_data = await _fetch_fundamental_data(orchestrator, symbol)
+        return _stream_analysis(
+            {
+                'company_data': company_data,
+                'industry_data': industry_data,
+                'competitor_data': competitor_data,
+                'timestamp': http_request.state.iso_now,
+                'symbol': symbol
+            },
+            claude_service.stream_company_fundamentals(
+                company_symbol=symbol,
+                deep=deep,
+                fundamental_data={
+                    'company': company_data,
+                    'industry': industry_data,
+                    'competitors': competitor_data
+                }
+            )
+        )
 
-        # Get industry data
-        industry_data = await orchestrator.stock_agent.process({
-            'action': 'industry_metrics',
-            'symbol': symbol
-        })
+    cache_key = make_cache_key('fundamentals', symbol, {'deep': deep})
 
-        # Get competitor data
-        competitor_data = await orchestrator.stock_agent.process({
-            'action': 'competitor_analysis',
-            'symbol': symbol
-        })
+    async def compute():
+        # Cache hits never reach Claude, so only a miss takes a rate-limit slot
+        await claude_rate_limit()
+        company_data, industry_data, competitor_data = await _fetch_fundamental_data(orchestrator, symbol)
 
         # Get Claude's fundamental analysis
         claude_analysis = await claude_service.analyze_company_fundamentals(
-            company_data=company_data,
-            industry_data=industry_data,
-            competitor_data=competitor_data
+            company_symbol=symbol,
+            deep=deep,
+            fundamental_data={
+                'company': company_data,
+                'industry': industry_data,
+                'competitors': competitor_data
+            }
         )
 
         # Combine all analyses
@@ -283,84 +496,81 @@ async def analyze_fundamentals(
             'industry_data': industry_data,
             'competitor_data': competitor_data,
             'claude_analysis': claude_analysis,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': http_request.state.iso_now,
             'symbol': symbol
         }
 
         return result
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Served from cache; concurrent misses for the same symbol share one computation
+    return await cached_flight(cache_key, CACHE_TTLS['fundamentals'], compute)
 
 @router.post("/analyze/indian", response_model=IndianStockResponse)
 async def analyze_indian_stock(
     request: IndianStockRequest,
-    background_tasks: BackgroundTasks,
     api_key: str = Depends(verify_api_key),
-    rate_limit: dict = Depends(get_rate_limit)
+    rate_limit: dict = Depends(get_rate_limit),
+    indian_stock_agent: IndianStockDataAgent = Depends(get_indian_stock_agent)
 ):
     """
     Analyze an Indian stock (NSE/BSE) and provide comprehensive insights
     """
-    try:
-        # Check cache first
-        cache_key = f"{request.symbol}_{request.exchange}"
-        cached_result = get_cached_analysis(cache_key)
-        if cached_result:
-            return IndianStockResponse(**cached_result)
-
-        # Perform analysis
-        result = await indian_stock_agent.process_request(
-            f"Analyze {request.symbol} on {request.exchange}",
-            context={
-                'include_technical': request.include_technical,
-                'include_sentiment': request.include_sentiment,
-                'include_growth': request.include_growth,
-                'timestamp': datetime.utcnow()
-            }
-        )
-
-        if 'error' in result:
-            raise HTTPException(status_code=404, detail=result['error'])
-
-        # Format response
-        response_data = {
-            'symbol': request.symbol,
-            'exchange': request.exchange,
-            'current_price': result['raw_data']['current_price'],
-            'market_cap': result['raw_data']['market_cap'],
-            'pe_ratio': result['raw_data']['pe_ratio'],
-            'volume': result['raw_data']['volume'],
-            'fifty_two_week_high': result['raw_data']['fifty_two_week_high'],
-            'fifty_two_week_low': result['raw_data']['fifty_two_week_low'],
-            'year_price_change': result['raw_data']['year_price_change'],
-            'analysis': result['stock_data'],
-            'timestamp': result.get('timestamp', datetime.utcnow()),
-            'status': 'success'
+    # Check cache first
+    cache_key = f"{request.symbol}_{request.exchange}"
+    cached_result = await get_cached_analysis(cache_key)
+    if cached_result:
+        return IndianStockResponse(**cached_result)
+
+    # Perform analysis
+    result = await indian_stock_agent.process_request(
+        f"Analyze {request.symbol} on {request.exchange}",
+        context={
+            'include_technical': request.include_technical,
+            'include_sentiment': request.include_sentiment,
+            'include_growth': request.include_growth,
+            'timestamp': datetime.utcnow()
         }
-
-        # Cache the result in background
-        background_tasks.add_task(cache_analysis, cache_key, response_data)
-
-        return IndianStockResponse(**response_data)
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
+
+    if 'error' in result:
+        raise HTTPException(status_code=404, detail=result['error'])
+
+    # Format response
+    response_data = {
+        'symbol': request.symbol,
+        'exchange': request.exchange,
+        'current_price': result['raw_data']['current_price'],
+        'market_cap': result['raw_data']['market_cap'],
+        'pe_ratio': result['raw_data']['pe_ratio'],
+        'volume': result['raw_data']['volume'],
+        'fifty_two_week_high': result['raw_data']['fifty_two_week_high'],
+        'fifty_two_week_low': result['raw_data']['fifty_two_week_low'],
+        'year_price_change': result['raw_data']['year_price_change'],
+        'analysis': result['stock_data'],
+        'timestamp': result.get('timestamp', datetime.utcnow()),
+        'status': 'success'
+    }
+
+    # Cache the result
+    await cache_analysis(cache_key, response_data)
+
+    return IndianStockResponse(**response_data)
 
 @router.get("/market/india")
 async def get_indian_market_summary(
-    api_key: str = Depends(verify_api_key)
+    api_key: str = Depends(verify_api_key),
+    claude_service: ClaudeService = Depends(get_claude_service),
+    indian_stock_agent: IndianStockDataAgent = Depends(get_indian_stock_agent)
 ):
     """
     Get comprehensive Indian market summary using Claude's analysis
     """
-    try:
-        # Analyze major Indian indices
-        nifty_analysis = await indian_stock_agent.process_request("Analyze NIFTY50.NS")
-        sensex_analysis = await indian_stock_agent.process_request("Analyze SENSEX.BO")
-        
-        # Get Claude's market analysis
-        market_prompt = f"""Analyze the current Indian market conditions:
+    # Analyze major Indian indices
+    nifty_analysis = await indian_stock_agent.process_request("Analyze NIFTY50.NS")
+    sensex_analysis = await indian_stock_agent.process_request("Analyze SENSEX.BO")
+    
+    # Get Claude's market analysis
+    market_prompt = f"""Analyze the current Indian market conditions:
 
 Nifty 50:
 {nifty_analysis['stock_data']}
@@ -377,16 +587,13 @@ Please provide:
 6. Technical Outlook
 7. Market Risks and Opportunities
 """
-        
-        market_analysis = await claude_service.analyze_text(market_prompt)
-        
-        return {
-            'nifty50': nifty_analysis['raw_data'],
-            'sensex': sensex_analysis['raw_data'],
-            'market_analysis': market_analysis,
-            'timestamp': datetime.utcnow(),
-            'status': 'success'
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    market_analysis = await claude_service.analyze_text(market_prompt)
+    
+    return {
+        'nifty50': nifty_analysis['raw_data'],
+        'sensex': sensex_analysis['raw_data'],
+        'market_analysis': market_analysis,
+        'timestamp': datetime.utcnow(),
+        'status': 'success'
+    }
@@ -1,59 +1,175 @@
 import os
-import anthropic
-from typing import Dict, List, Optional
+import hashlib
+import logging
+import httpx
+from anthropic import AsyncAnthropic
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException
 
+logger = logging.getLogger(__name__)
+
 class ClaudeService:
-    def __init__(self):
+    HAIKU = "claude-3-haiku-20240307"
+    SONNET = "claude-3-5-sonnet-20241022"
+
+    def __init__(self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[aioredis.Redis] = None,
+        cache_ttl: int = 1800
+    ):
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
-        self.client = anthropic.Client(api_key=self.api_key)
-        self.model = "claude-3-haiku-20240307"  # Using Claude 3 Haiku
-        self.max_tokens = 4096  # Haiku's context window
+        # Reuse the app-wide connection pool when one is provided
+        self.client = AsyncAnthropic(api_key=self.api_key, http_client=http_client)
+        # Defaults; each method can pick a model and output budget for its task
+        self.model = self.HAIKU
+        self.max_tokens = 4096
+        self.sentiment_max_tokens = 1024
+        # Responses are cached by prompt hash when a Redis client is provided
+        self.cache = cache
+        self.cache_ttl = cache_ttl
 
-    async def analyze_stock_sentiment(self, 
+    def _sentiment_prompt(self,
         company_name: str,
         news_data: List[Dict],
         financial_data: Optional[Dict] = None
+    ) -> Tuple[str, str]:
+        """Build the system and user prompts for sentiment analysis"""
+        # Prepare context for Claude; parts are joined once instead of growing a string
+        parts = [f"Analyze the sentiment and potential impact on {company_name}'s stock based on the following information:\n"]
+
+        # Add news articles
+        parts.append("Recent News:")
+        parts.extend(f"- {article['title']}: {article['summary']}" for article in news_data)
+
+        # Add financial data if available
+        if financial_data:
+            parts.append("\nFinancial Metrics:")
+            parts.extend(f"- {key}: {value}" for key, value in financial_data.items())
+
+        system_prompt = "You are a financial analyst expert. Provide concise, accurate analysis of stock sentiment and market impact."
+        user_prompt = "\n".join(parts) + "\n\nProvide a detailed analysis of the sentiment, key factors affecting the stock, and potential market impact. Format the response as JSON with 'sentiment_score', 'analysis', 'key_factors', and 'market_impact' fields."
+        return system_prompt, user_prompt
+
+    def _market_insights_prompt(self,
+        market_data: Dict,
+        economic_indicators: Optional[Dict] = None,
+        global_events: Optional[Dict] = None
+    ) -> Tuple[str, str]:
+        """Build the system and user prompts for market insights"""
+        parts = ["Based on the following market data, provide comprehensive insights:\n"]
+        parts.extend(f"{key}: {value}" for key, value in market_data.items())
+
+        if economic_indicators:
+            parts.append("\nEconomic Indicators:")
+            parts.extend(f"{key}: {value}" for key, value in economic_indicators.items())
+
+        if global_events:
+            parts.append("\nGlobal Events:")
+            parts.extend(f"{key}: {value}" for key, value in global_events.items())
+
+        system_prompt = "You are a market analysis expert. Provide clear, actionable insights based on market data."
+        user_prompt = "\n".join(parts) + "\n\nProvide market insights, trends, and recommendations."
+        return system_prompt, user_prompt
+
+    def _fundamentals_prompt(self,
+        company_symbol: str,
+        fundamental_data: Dict
+    ) -> Tuple[str, str]:
+        """Build the system and user prompts for fundamental analysis"""
+        parts = [f"Analyze the fundamental data for {company_symbol}:\n"]
+        parts.extend(f"{key}: {value}" for key, value in fundamental_data.items())
+
+        system_prompt = "You are a fundamental analysis expert. Provide detailed analysis of company fundamentals and financial health."
+        user_prompt = "\n".join(parts) + "\n\nProvide a comprehensive analysis of the company's fundamentals, financial health, and future outlook."
+        return system_prompt, user_prompt
+
+    async def _complete(self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Get Claude's response text, reusing the cached answer for an identical prompt"""
+        model = model or self.model
+        key = None
+        if self.cache is not None:
+            key = "claude:" + hashlib.sha256((system_prompt + user_prompt + model).encode()).hexdigest()
+            try:
+                cached = await self.cache.get(key)
+            except (RedisError, OSError) as e:
+                # The cache is an optimization; treat an outage as a miss and skip the write
+                logger.warning("Claude cache read failed: %s", e)
+                key = None
+                cached = None
+            if cached is not None:
+                return cached
+
+        response = await self.client.messages.create(
+            model=model,
+            max_tokens=max_tokens or self.max_tokens,
+            system=system_prompt,
+            messages=[
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ]
+        )
+        text = response.content[0].text
+
+        if key is not None:
+            try:
+                await self.cache.set(key, text, ex=self.cache_ttl)
+            except (RedisError, OSError) as e:
+                logger.warning("Claude cache write failed: %s", e)
+        return text
+
+    async def _stream(self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Yield Claude's response text as it is generated"""
+        async with self.client.messages.stream(
+            model=model or self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            system=system_prompt,
+            messages=[
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    async def analyze_stock_sentiment(self,
+        company_name: str,
+        news_data: List[Dict],
+        financial_data: Optional[Dict] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
     ) -> Dict:
         """
         Analyze stock sentiment using Claude's advanced NLP capabilities
         """
         try:
-            # Prepare context for Claude
-            context = f"Analyze the sentiment and potential impact on {company_name}'s stock based on the following information:\n\n"
-            
-            # Add news articles
-            context += "Recent News:\n"
-            for article in news_data:
-                context += f"- {article['title']}: {article['summary']}\n"
-            
-            # Add financial data if available
-            if financial_data:
-                context += "\nFinancial Metrics:\n"
-                for key, value in financial_data.items():
-                    context += f"- {key}: {value}\n"
-            
-            # Create the message with system prompt
-            system_prompt = "You are a financial analyst expert. Provide concise, accurate analysis of stock sentiment and market impact."
-            
+            system_prompt, user_prompt = self._sentiment_prompt(company_name, news_data, financial_data)
+
             # Get Claude's response
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": context + "\nProvide a detailed analysis of the sentiment, key factors affecting the stock, and potential market impact. Format the response as JSON with 'sentiment_score', 'analysis', 'key_factors', and 'market_impact' fields."
-                    }
-                ]
+            content = await self._complete(
+                system_prompt,
+                user_prompt,
+                model=model,
+                max_tokens=max_tokens or self.sentiment_max_tokens
             )
 
-            # Parse the response content
-            content = response.content[0].text
-            
             # Here you would parse the JSON response
             # For now, returning a simplified structure
             return {
@@ -69,33 +185,39 @@ class ClaudeService:
                 detail=f"Error analyzing stock sentiment: {str(e)}"
             )
 
-    async def generate_market_insights(self, market_data: Dict) -> Dict:
+    def stream_stock_sentiment(self,
+        company_name: str,
+        news_data: List[Dict],
+        financial_data: Optional[Dict] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream Claude's sentiment analysis text
+        """
+        return self._stream(
+            *self._sentiment_prompt(company_name, news_data, financial_data),
+            model=model,
+            max_tokens=max_tokens or self.sentiment_max_tokens
+        )
+
+    async def generate_market_insights(self,
+        market_data: Dict,
+        economic_indicators: Optional[Dict] = None,
+        global_events: Optional[Dict] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict:
         """
         Generate comprehensive market insights using Claude
         """
         try:
-            # Prepare context
-            context = "Based on the following market data, provide comprehensive insights:\n\n"
-            for key, value in market_data.items():
-                context += f"{key}: {value}\n"
-
-            # Create message with system prompt
-            system_prompt = "You are a market analysis expert. Provide clear, actionable insights based on market data."
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": context + "\nProvide market insights, trends, and recommendations."
-                    }
-                ]
-            )
+            system_prompt, user_prompt = self._market_insights_prompt(market_data, economic_indicators, global_events)
+
+            insights = await self._complete(system_prompt, user_prompt, model=model, max_tokens=max_tokens)
 
             return {
-                "insights": response.content[0].text,
+                "insights": insights,
                 "timestamp": market_data.get("timestamp", "")
             }
 
@@ -105,36 +227,44 @@ class ClaudeService:
                 detail=f"Error generating market insights: {str(e)}"
             )
 
-    async def analyze_company_fundamentals(self, 
+    def stream_market_insights(self,
+        market_data: Dict,
+        economic_indicators: Optional[Dict] = None,
+        global_events: Optional[Dict] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream Claude's market insights text
+        """
+        return self._stream(
+            *self._market_insights_prompt(market_data, economic_indicators, global_events),
+            model=model,
+            max_tokens=max_tokens
+        )
+
+    async def analyze_company_fundamentals(self,
         company_symbol: str,
-        fundamental_data: Dict
+        fundamental_data: Dict,
+        deep: bool = False,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
     ) -> Dict:
         """
-        Analyze company fundamentals using Claude
+        Analyze company fundamentals using Claude; deep=True uses Sonnet instead of Haiku
         """
         try:
-            # Prepare context
-            context = f"Analyze the fundamental data for {company_symbol}:\n\n"
-            for key, value in fundamental_data.items():
-                context += f"{key}: {value}\n"
-
-            # Create message with system prompt
-            system_prompt = "You are a fundamental analysis expert. Provide detailed analysis of company fundamentals and financial health."
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": context + "\nProvide a comprehensive analysis of the company's fundamentals, financial health, and future outlook."
-                    }
-                ]
+            system_prompt, user_prompt = self._fundamentals_prompt(company_symbol, fundamental_data)
+
+            analysis = await self._complete(
+                system_prompt,
+                user_prompt,
+                model=model or (self.SONNET if deep else None),
+                max_tokens=max_tokens
             )
 
             return {
-                "analysis": response.content[0].text,
+                "analysis": analysis,
                 "company_symbol": company_symbol,
                 "timestamp": fundamental_data.get("timestamp", "")
             }
@@ -144,3 +274,34 @@ class ClaudeService:
                 status_code=500,
                 detail=f"Error analyzing company fundamentals: {str(e)}"
             )
+
+    def stream_company_fundamentals(self,
+        company_symbol: str,
+        fundamental_data: Dict,
+        deep: bool = False,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream Claude's fundamental analysis text; deep=True uses Sonnet instead of Haiku
+        """
+        return self._stream(
+            *self._fundamentals_prompt(company_symbol, fundamental_data),
+            model=model or (self.SONNET if deep else None),
+            max_tokens=max_tokens
+        )
+
+    async def analyze_text(self, prompt: str) -> str:
+        """
+        Run a free-form analysis prompt through Claude
+        """
+        try:
+            system_prompt = "You are a financial market analyst. Provide clear, data-driven analysis."
+
+            return await self._complete(system_prompt, prompt)
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error analyzing text: {str(e)}"
+            )
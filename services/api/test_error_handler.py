@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+import httpx
+from httpx import ASGITransport
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+import pytest_asyncio
+
+# Add the api directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from middleware.error_handler import ErrorHandler, NotFoundError
+
+@pytest.fixture(scope="module")
+def app():
+    # Same registration order as main.py: ErrorHandler first, so it sits inside CORS
+    app = FastAPI()
+    app.add_middleware(ErrorHandler)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("something broke")
+
+    @app.get("/missing")
+    async def missing():
+        raise NotFoundError()
+
+    return app
+
+@pytest_asyncio.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+@pytest.mark.asyncio
+async def test_unhandled_error_body(client):
+    response = await client.get("/boom", headers={"Origin": "http://example.com"})
+    assert response.status_code == 500
+    error = response.json()["error"]
+    assert error["type"] == "RuntimeError"
+    assert error["message"] == "something broke"
+    assert error["status"] == 500
+    assert error["details"] is None
+    assert len(error["id"]) == 32
+    # The error response must still carry CORS headers for browsers to read it
+    assert response.headers["access-control-allow-origin"] == "*"
+
+@pytest.mark.asyncio
+async def test_known_error_keeps_status(client):
+    response = await client.get("/missing")
+    assert response.status_code == 404
+    error = response.json()["error"]
+    assert error["type"] == "NotFoundError"
+    assert error["message"] == "Resource not found"
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
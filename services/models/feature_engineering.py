@@ -1,39 +1,76 @@
 import pandas as pd
 import numpy as np
+import bottleneck as bn
 from typing import List, Dict, Any, Tuple
-import ta
+from collections import OrderedDict
+import hashlib
+import json
+import talib
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
 
+# Rows of history needed to reproduce the latest row's features: covers the
+# 50-day windows plus warm-up for the EMA/ADX-based indicators. Every feature
+# must depend only on a bounded window (no running totals from the first row)
+PREDICTION_WINDOW = 250
+PREDICTION_CACHE_SIZE = 32
+
 class FeatureEngineer:
     def __init__(self):
         self.scaler = StandardScaler()
         self.feature_columns = []
+        self.prediction_cache = OrderedDict()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The prediction cache is runtime state; keep it out of saved models
+        state = self.__dict__.copy()
+        state.pop('prediction_cache', None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.prediction_cache = OrderedDict()
 
     def create_technical_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Create technical indicators as features"""
-        # Trend Indicators
-        df['sma_20'] = ta.trend.sma_indicator(df['close'], window=20)
-        df['sma_50'] = ta.trend.sma_indicator(df['close'], window=50)
-        df['ema_20'] = ta.trend.ema_indicator(df['close'], window=20)
-        df['macd'] = ta.trend.macd_diff(df['close'])
-        df['adx'] = ta.trend.adx(df['high'], df['low'], df['close'])
-
-        # Momentum Indicators
-        df['rsi'] = ta.momentum.rsi(df['close'])
-        df['stoch'] = ta.momentum.stoch(df['high'], df['low'], df['close'])
-        df['cci'] = ta.trend.cci(df['high'], df['low'], df['close'])
-        df['williams_r'] = ta.momentum.williams_r(df['high'], df['low'], df['close'])
-
-        # Volatility Indicators
-        df['bbands_width'] = ta.volatility.bollinger_wband(df['close'])
-        df['atr'] = ta.volatility.average_true_range(df['high'], df['low'], df['close'])
-
-        # Volume Indicators
-        df['obv'] = ta.volume.on_balance_volume(df['close'], df['volume'])
-        df['mfi'] = ta.volume.money_flow_index(df['high'], df['low'], df['close'], df['volume'])
-
-        return df
+        # TA-Lib's C kernels work on contiguous float64 arrays
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        _, _, macd_hist = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+        stoch_k, _ = talib.STOCHF(high, low, close, fastk_period=14, fastd_period=3)
+        bb_upper, bb_middle, bb_lower = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2)
+
+        # OBV is a running total from the first row, so its level depends on where the
+        # history starts; its 20-day change doesn't, so training and prediction agree
+        obv = talib.OBV(close, volume)
+        obv_20d = np.full_like(obv, np.nan)
+        obv_20d[20:] = obv[20:] - obv[:-20]
+
+        return df.assign(
+            # Trend Indicators
+            sma_20=talib.SMA(close, timeperiod=20),
+            sma_50=talib.SMA(close, timeperiod=50),
+            ema_20=talib.EMA(close, timeperiod=20),
+            macd=macd_hist,
+            adx=talib.ADX(high, low, close, timeperiod=14),
+
+            # Momentum Indicators
+            rsi=talib.RSI(close, timeperiod=14),
+            stoch=stoch_k,
+            cci=talib.CCI(high, low, close, timeperiod=20),
+            williams_r=talib.WILLR(high, low, close, timeperiod=14),
+
+            # Volatility Indicators
+            bbands_width=(bb_upper - bb_lower) / bb_middle * 100,
+            atr=talib.ATR(high, low, close, timeperiod=14),
+
+            # Volume Indicators
+            obv_20d=obv_20d,
+            mfi=talib.MFI(high, low, close, volume, timeperiod=14)
+        )
 
     def create_price_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Create price-based features"""
@@ -41,36 +78,49 @@ class FeatureEngineer:
         df['returns'] = df['close'].pct_change()
         df['log_returns'] = np.log1p(df['returns'])
         
-        # Rolling Statistics
+        # Rolling Statistics, computed on the raw arrays and added in one assign
+        returns = df['returns'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+
         windows = [5, 10, 20, 50]
+        cols = {}
+        high_max = {}
+        low_min = {}
         for window in windows:
-            df[f'volatility_{window}d'] = df['returns'].rolling(window).std()
-            df[f'momentum_{window}d'] = df['returns'].rolling(window).mean()
-            df[f'price_range_{window}d'] = (df['high'].rolling(window).max() - 
-                                          df['low'].rolling(window).min()) / df['close']
+            high_max[window] = bn.move_max(high, window)
+            low_min[window] = bn.move_min(low, window)
+            cols[f'volatility_{window}d'] = bn.move_std(returns, window, ddof=1)
+            cols[f'momentum_{window}d'] = bn.move_mean(returns, window)
+            cols[f'price_range_{window}d'] = (high_max[window] - low_min[window]) / close
 
         # Price Levels
-        df['distance_from_high'] = df['close'] / df['high'].rolling(20).max() - 1
-        df['distance_from_low'] = df['close'] / df['low'].rolling(20).min() - 1
+        cols['distance_from_high'] = close / high_max[20] - 1
+        cols['distance_from_low'] = close / low_min[20] - 1
 
-        return df
+        return df.assign(**cols)
 
     def create_sentiment_features(self, sentiment_data: List[Dict[str, Any]]) -> pd.DataFrame:
         """Create sentiment-based features"""
-        df = pd.DataFrame(sentiment_data)
-        
-        # Aggregate sentiment scores
-        df['sentiment_score'] = df['sentiment'].map({'positive': 1, 'neutral': 0, 'negative': -1})
-        df['weighted_sentiment'] = df['sentiment_score'] * df['confidence']
-        
-        # Calculate sentiment metrics
+        # Pull each field out once and aggregate in NumPy rather than via a DataFrame
+        n = len(sentiment_data)
+        sentiment_score = np.fromiter(
+            ((d['sentiment'] == 'positive') - (d['sentiment'] == 'negative') for d in sentiment_data),
+            dtype=np.int8, count=n
+        )
+        confidence = np.fromiter((d['confidence'] for d in sentiment_data), dtype=np.float64, count=n)
+        volume = np.fromiter((d['volume'] for d in sentiment_data), dtype=np.float64, count=n)
+        weighted_sentiment = sentiment_score * confidence
+
+        # Calculate sentiment metrics (std uses ddof=1 to match pandas)
         sentiment_features = {
-            'avg_sentiment': df['sentiment_score'].mean(),
-            'weighted_avg_sentiment': (df['weighted_sentiment'] * df['volume']).sum() / df['volume'].sum(),
-            'sentiment_volatility': df['sentiment_score'].std(),
-            'sentiment_momentum': df['sentiment_score'].diff().mean(),
-            'positive_ratio': (df['sentiment_score'] > 0).mean(),
-            'negative_ratio': (df['sentiment_score'] < 0).mean()
+            'avg_sentiment': sentiment_score.mean(),
+            'weighted_avg_sentiment': (weighted_sentiment * volume).sum() / volume.sum(),
+            'sentiment_volatility': sentiment_score.std(ddof=1) if n > 1 else np.nan,
+            'sentiment_momentum': np.diff(sentiment_score).mean() if n > 1 else np.nan,
+            'positive_ratio': (sentiment_score > 0).mean(),
+            'negative_ratio': (sentiment_score < 0).mean()
         }
         
         return pd.DataFrame([sentiment_features])
@@ -86,11 +136,11 @@ class FeatureEngineer:
         }
         return pd.DataFrame([features])
 
-    def prepare_features(self, 
-                        historical_data: pd.DataFrame,
-                        sentiment_data: List[Dict[str, Any]],
-                        market_data: Dict[str, Any]) -> Tuple[pd.DataFrame, List[str]]:
-        """Prepare all features for the model"""
+    def build_features(self,
+                       historical_data: pd.DataFrame,
+                       sentiment_data: List[Dict[str, Any]],
+                       market_data: Dict[str, Any]) -> pd.DataFrame:
+        """Create all unscaled features"""
         # Create features from historical data
         df = historical_data.copy()
         df = self.create_technical_features(df)
@@ -102,21 +152,31 @@ class FeatureEngineer:
         # Create market features
         market_features = self.create_market_features(market_data)
 
-        # Combine all features
-        for col in sentiment_features.columns:
-            df[f'sentiment_{col}'] = sentiment_features[col].iloc[0]
-        
-        for col in market_features.columns:
-            df[f'market_{col}'] = market_features[col].iloc[0]
+        # Combine all features, broadcasting the scalars in a single assign
+        scalar_cols = {f'sentiment_{col}': sentiment_features[col].iloc[0] for col in sentiment_features.columns}
+        scalar_cols.update({f'market_{col}': market_features[col].iloc[0] for col in market_features.columns})
+        df = df.assign(**scalar_cols)
+
+        # Handle missing values in place (fillna(method=...) is deprecated and copies twice)
+        df.ffill(inplace=True)
+        df.bfill(inplace=True)
+        return df
 
-        # Handle missing values
-        df = df.fillna(method='ffill').fillna(method='bfill')
+    def prepare_features(self, 
+                        historical_data: pd.DataFrame,
+                        sentiment_data: List[Dict[str, Any]],
+                        market_data: Dict[str, Any]) -> Tuple[pd.DataFrame, List[str]]:
+        """Prepare all features for the model, fitting the scaler (training path)"""
+        df = self.build_features(historical_data, sentiment_data, market_data)
 
         # Scale features
         feature_cols = [col for col in df.columns if col not in ['date', 'open', 'high', 'low', 'close', 'volume']]
-        df[feature_cols] = self.scaler.fit_transform(df[feature_cols])
+        # float32 halves the bytes the models traverse and matches the ONNX input type
+        df[feature_cols] = self.scaler.fit_transform(df[feature_cols]).astype(np.float32)
 
         self.feature_columns = feature_cols
+        # Cached prediction rows were scaled with the previous fit
+        self.prediction_cache.clear()
         return df, feature_cols
 
     def create_targets(self, df: pd.DataFrame, forecast_periods: List[int]) -> pd.DataFrame:
@@ -134,6 +194,27 @@ class FeatureEngineer:
                               current_data: pd.DataFrame,
                               sentiment_data: List[Dict[str, Any]],
                               market_data: Dict[str, Any]) -> pd.DataFrame:
-        """Prepare features for prediction"""
-        df, _ = self.prepare_features(current_data, sentiment_data, market_data)
-        return df[self.feature_columns].iloc[-1:]
+        """Prepare the latest feature row for prediction using the scaler fitted in training"""
+        # Only the tail of the history affects the last row's features
+        tail = current_data.iloc[-PREDICTION_WINDOW:]
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(tail).to_numpy().tobytes())
+        digest.update(json.dumps([sentiment_data, market_data], sort_keys=True, default=str).encode())
+        key = digest.hexdigest()
+
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            self.prediction_cache.move_to_end(key)
+            return cached
+
+        df = self.build_features(tail, sentiment_data, market_data)
+        row = df[self.feature_columns].iloc[-1:]
+        X = pd.DataFrame(
+            self.scaler.transform(row).astype(np.float32),
+            columns=self.feature_columns,
+            index=row.index
+        )
+
+        self.prediction_cache[key] = X
+        if len(self.prediction_cache) > PREDICTION_CACHE_SIZE:
+            self.prediction_cache.popitem(last=False)
+        return X
@@ -5,6 +5,7 @@ import json
 from datetime import datetime
 import os
 from predictive_model import StockPredictiveModel
+from onnx_model import OnnxModel, to_onnx
 
 class ModelManager:
     def __init__(self, model_dir: str = 'models'):
@@ -105,10 +106,24 @@ class ModelManager:
 
         return formatted
 
+    def _onnx_path(self, symbol: str, name: str) -> str:
+        return os.path.join(self.model_dir, f"{symbol}_{name}.onnx")
+
     def _save_model(self, symbol: str, model: StockPredictiveModel):
-        """Save model to disk"""
+        """Save model to disk: one ONNX file per sub-model plus the feature pipeline"""
+        n_features = len(model.feature_engineer.feature_columns)
+        for name, sub_model in model.models.items():
+            with open(self._onnx_path(symbol, name), 'wb') as f:
+                f.write(to_onnx(sub_model, n_features))
+
+        # SHAP values are not persisted; they are recomputed on demand
         model_path = os.path.join(self.model_dir, f"{symbol}_model.joblib")
-        joblib.dump(model, model_path)
+        joblib.dump({
+            'feature_engineer': model.feature_engineer,
+            'feature_importance': model.feature_importance,
+            'forecast_periods': model.forecast_periods,
+            'model_names': list(model.models)
+        }, model_path)
 
     def _save_metadata(self, symbol: str):
         """Save model metadata to disk"""
@@ -122,12 +137,34 @@ class ModelManager:
         metadata_path = os.path.join(self.model_dir, f"{symbol}_metadata.json")
 
         if os.path.exists(model_path) and os.path.exists(metadata_path):
-            self.models[symbol] = joblib.load(model_path)
+            state = joblib.load(model_path, mmap_mode='r')
+            model = StockPredictiveModel()
+            model.feature_engineer = state['feature_engineer']
+            model.feature_importance = state['feature_importance']
+            model.forecast_periods = state['forecast_periods']
+            model.models = {
+                name: OnnxModel(self._onnx_path(symbol, name))
+                for name in state['model_names']
+            }
+            self.models[symbol] = model
             with open(metadata_path, 'r') as f:
                 self.model_metadata[symbol] = json.load(f)
         else:
             raise FileNotFoundError(f"No trained model found for {symbol}")
 
+    def warm_models(self) -> List[str]:
+        """Load every saved model and its ONNX sessions up front, e.g. from an app's
+        startup hook, so the first prediction per symbol doesn't pay the load"""
+        suffix = "_model.joblib"
+        loaded = []
+        for filename in sorted(os.listdir(self.model_dir)):
+            if filename.endswith(suffix):
+                symbol = filename[:-len(suffix)]
+                if symbol not in self.models:
+                    self._load_model(symbol)
+                loaded.append(symbol)
+        return loaded
+
     def get_model_metadata(self, symbol: str) -> Dict[str, Any]:
         """Get model metadata"""
         if symbol in self.model_metadata:
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from typing import Any
+import onnxruntime as ort
+from onnxmltools import convert_lightgbm, convert_xgboost
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from xgboost import XGBRegressor
+from lightgbm import LGBMRegressor
+
+def to_onnx(model: Any, n_features: int) -> bytes:
+    """Serialize a fitted sklearn/XGBoost/LightGBM regressor to ONNX"""
+    initial_types = [('input', FloatTensorType([None, n_features]))]
+    if isinstance(model, XGBRegressor):
+        onnx_model = convert_xgboost(model, initial_types=initial_types)
+    elif isinstance(model, LGBMRegressor):
+        onnx_model = convert_lightgbm(model, initial_types=initial_types)
+    else:
+        onnx_model = convert_sklearn(model, initial_types=initial_types)
+    return onnx_model.SerializeToString()
+
+def _session_options() -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.enable_mem_pattern = True
+    # One thread per session; concurrency comes from workers and requests
+    options.intra_op_num_threads = int(os.getenv('ORT_INTRA_OP_THREADS', '1'))
+    return options
+
+class OnnxModel:
+    """Inference-only stand-in for a fitted regressor, backed by onnxruntime"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.session = ort.InferenceSession(
+            path,
+            sess_options=_session_options(),
+            providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X: Any) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        return self.session.run(None, {self.input_name: X})[0].ravel()
@@ -1,6 +1,9 @@
+import os
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Any
+from joblib import Parallel, delayed
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.model_selection import TimeSeriesSplit
 from xgboost import XGBRegressor
@@ -11,6 +14,43 @@ import shap
 from datetime import datetime, timedelta
 from feature_engineering import FeatureEngineer
 
+# Concurrent Optuna trials (threads); each trial also fits its CV folds in
+# parallel, and models are fit single-threaded during the search
+N_TRIAL_JOBS = min(os.cpu_count() or 1, 8)
+
+def _cuda_available() -> bool:
+    """Whether XGBoost/LightGBM should train on the GPU (MODEL_DEVICE=cpu forces CPU)"""
+    if os.getenv('MODEL_DEVICE', '').lower() == 'cpu':
+        return False
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+USE_GPU = _cuda_available()
+
+# Fold workers per trial, so trials x folds stays within the core count. On the GPU
+# folds run in the trial's own thread: each loky worker would open its own CUDA context
+FOLD_JOBS = 1 if USE_GPU else max(1, (os.cpu_count() or 1) // N_TRIAL_JOBS)
+
+# Quantiles bounding the reported growth interval
+GROWTH_INTERVAL = (0.05, 0.95)
+
+# Rows sampled from the training matrix for SHAP feature importance
+SHAP_SAMPLE_SIZE = 200
+
+def _fit_fold(model: Any,
+              X: pd.DataFrame,
+              y: pd.Series,
+              train_idx: np.ndarray,
+              val_idx: np.ndarray) -> float:
+    """Fit a fresh copy of model on one CV fold and return its validation RMSE"""
+    model = clone(model)
+    model.fit(X.iloc[train_idx], y.iloc[train_idx])
+    pred = model.predict(X.iloc[val_idx])
+    return np.sqrt(np.mean((y.iloc[val_idx] - pred) ** 2))
+
 class StockPredictiveModel:
     def __init__(self):
         self.feature_engineer = FeatureEngineer()
@@ -51,6 +91,14 @@ class StockPredictiveModel:
                 self.models[f'growth_{period}d'] = growth_model
                 self.models[f'risk_{period}d'] = risk_model
 
+                # Quantile models bound the growth prediction interval
+                self.models[f'growth_{period}d_lower'] = self._train_quantile_model(
+                    df[feature_cols], df[f'target_{period}d'], GROWTH_INTERVAL[0]
+                )
+                self.models[f'growth_{period}d_upper'] = self._train_quantile_model(
+                    df[feature_cols], df[f'target_{period}d'], GROWTH_INTERVAL[1]
+                )
+
                 # Calculate feature importance
                 self._calculate_feature_importance(
                     growth_model, 
@@ -95,15 +143,16 @@ class StockPredictiveModel:
                 # Predict risk
                 risk_pred = self.models[f'risk_{period}d'].predict(X)[0]
 
-                # Calculate confidence intervals
-                growth_std = self.models[f'growth_{period}d'].predict_proba(X)[0].std()
+                # Confidence interval from the quantile models
+                growth_lower = self.models[f'growth_{period}d_lower'].predict(X)[0]
+                growth_upper = self.models[f'growth_{period}d_upper'].predict(X)[0]
                 
                 predictions[f'{period}d'] = {
                     'growth': {
                         'prediction': growth_pred,
                         'confidence_interval': {
-                            'lower': growth_pred - 1.96 * growth_std,
-                            'upper': growth_pred + 1.96 * growth_std
+                            'lower': growth_lower,
+                            'upper': growth_upper
                         }
                     },
                     'risk': {
@@ -137,25 +186,20 @@ class StockPredictiveModel:
             # Create model with trial parameters
             model = self._create_model(trial)
             
-            # Perform cross-validation
-            scores = []
-            for train_idx, val_idx in tscv.split(X):
-                X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-                y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-                
-                model.fit(X_train, y_train)
-                pred = model.predict(X_val)
-                score = np.sqrt(np.mean((y_val - pred) ** 2))
-                scores.append(score)
+            # Perform cross-validation, fitting the folds in parallel
+            scores = Parallel(n_jobs=FOLD_JOBS, backend='loky')(
+                delayed(_fit_fold)(model, X, y, train_idx, val_idx)
+                for train_idx, val_idx in tscv.split(X)
+            )
             
             return np.mean(scores)
 
         # Optimize hyperparameters
         study = optuna.create_study(direction='minimize')
-        study.optimize(objective, n_trials=50)
+        study.optimize(objective, n_trials=50, n_jobs=N_TRIAL_JOBS)
 
-        # Train final model with best parameters
-        best_model = self._create_model(study.best_trial)
+        # Train final model with best parameters, using every core for the one fit
+        best_model = self._create_model(study.best_trial, n_jobs=-1)
         best_model.fit(X, y)
 
         # Calculate metrics
@@ -169,7 +213,21 @@ class StockPredictiveModel:
 
         return best_model, metrics
 
-    def _create_model(self, trial: optuna.Trial) -> Any:
+    def _train_quantile_model(self, X: pd.DataFrame, y: pd.Series, alpha: float) -> LGBMRegressor:
+        """Fit a LightGBM model for the alpha quantile of y"""
+        model = LGBMRegressor(
+            objective='quantile',
+            alpha=alpha,
+            n_estimators=200,
+            learning_rate=0.05,
+            random_state=42,
+            n_jobs=-1,
+            **({'device': 'gpu', 'gpu_use_dp': False} if USE_GPU else {})
+        )
+        model.fit(X, y)
+        return model
+
+    def _create_model(self, trial: optuna.Trial, n_jobs: int = 1) -> Any:
         """Create model with trial parameters"""
         model_type = trial.suggest_categorical('model_type', 
             ['rf', 'gbm', 'xgb', 'lgbm']
@@ -180,7 +238,8 @@ class StockPredictiveModel:
                 n_estimators=trial.suggest_int('n_estimators', 100, 500),
                 max_depth=trial.suggest_int('max_depth', 3, 10),
                 min_samples_split=trial.suggest_int('min_samples_split', 2, 10),
-                random_state=42
+                random_state=42,
+                n_jobs=n_jobs
             )
         elif model_type == 'gbm':
             return GradientBoostingRegressor(
@@ -194,14 +253,19 @@ class StockPredictiveModel:
                 n_estimators=trial.suggest_int('n_estimators', 100, 500),
                 learning_rate=trial.suggest_loguniform('learning_rate', 1e-3, 1e-1),
                 max_depth=trial.suggest_int('max_depth', 3, 10),
-                random_state=42
+                random_state=42,
+                tree_method='hist',
+                device='cuda' if USE_GPU else 'cpu',
+                n_jobs=n_jobs
             )
         else:
             return LGBMRegressor(
                 n_estimators=trial.suggest_int('n_estimators', 100, 500),
                 learning_rate=trial.suggest_loguniform('learning_rate', 1e-3, 1e-1),
                 max_depth=trial.suggest_int('max_depth', 3, 10),
-                random_state=42
+                random_state=42,
+                n_jobs=n_jobs,
+                **({'device': 'gpu', 'gpu_use_dp': False} if USE_GPU else {})
             )
 
     def _calculate_metrics(self, 
@@ -228,9 +292,10 @@ class StockPredictiveModel:
             'importance': model.feature_importances_
         }).sort_values('importance', ascending=False)
 
-        # Calculate SHAP values
-        explainer = shap.TreeExplainer(model)
-        shap_values = explainer.shap_values(X)
+        # Calculate SHAP values on a fixed sample; importance doesn't need every row
+        explainer = shap.TreeExplainer(model, feature_perturbation='tree_path_dependent')
+        sample_idx = np.random.RandomState(42).choice(len(X), size=min(SHAP_SAMPLE_SIZE, len(X)), replace=False)
+        shap_values = explainer.shap_values(X.iloc[sample_idx], approximate=True)
 
         self.feature_importance[model_name] = importance
         self.shap_values[model_name] = shap_values
@@ -255,5 +320,6 @@ class StockPredictiveModel:
 
         return {
             'feature_importance': self.feature_importance[model_name].to_dict(),
-            'shap_values': self.shap_values[model_name].tolist()
+            # Only available for models trained in this process (not loaded from ONNX)
+            'shap_values': self.shap_values[model_name].tolist() if model_name in self.shap_values else None
         }
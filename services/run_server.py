@@ -5,12 +5,23 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# One worker per core by default (override with WORKERS=<n>).
+# DEV=1 is for development only: it enables auto-reload, watching just the api package.
+# Production deployments leave DEV unset so no file watcher or reload supervisor runs.
+WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))
+DEV = os.getenv("DEV") == "1"
+
 if __name__ == "__main__":
     # Run the server
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,  # Enable auto-reload during development
-        workers=1     # Number of worker processes
+        reload=DEV,          # Auto-reload during development only
+        reload_dirs=["api"] if DEV else None,
+        workers=WORKERS,     # Number of worker processes (ignored when reloading)
+        loop="auto",         # uvloop when installed (not available on Windows)
+        http="httptools",
+        log_level="warning",
+        access_log=False
     )
@@ -1,50 +1,28 @@
-import requests
-import json
+import os
+import functools
+import httpx
+import orjson
+import pytest
+import pytest_asyncio
 
-BASE_URL = "http://localhost:8000"
+# Integration tests against a running server, e.g. `python main.py`, then
+# `pytest -n auto test_endpoints.py` (pytest-xdist) to spread the cases over workers.
+# They are skipped when nothing is listening at API_BASE_URL.
+BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
-def test_chat():
-    """
-    Test the chat endpoint which uses Claude via LangChain's ConversationChain.
-    This maintains context across multiple messages.
-    """
-    print("\n=== Testing Chat Endpoint with Claude ===")
-    url = f"{BASE_URL}/chat"
-    
-    # Test multiple messages to demonstrate context retention
-    messages = [
-        "Can you explain AWS Lambda in simple terms?",
-        "What are some common use cases for the service you just described?",
-        "What are the main limitations or constraints I should be aware of?"
-    ]
-    
-    for message in messages:
-        payload = {"message": message}
-        print(f"\nSending message: {message}")
-        response = requests.post(url, json=payload)
-        
-        if response.status_code == 200:
-            print(f"Response: {response.json()['response']}")
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
-
-def test_document_processing():
-    """
-    Test the document processing endpoint which demonstrates:
-    1. Document loading
-    2. Text splitting
-    3. HuggingFace embedding creation
-    4. Vector storage
-    """
-    print("\n=== Testing Document Processing Endpoint ===")
-    url = f"{BASE_URL}/process-document"
-    
-    # Create a sample document about AWS
-    with open("sample_doc.txt", "w") as f:
-        f.write("""
-AWS CloudFormation provides a common language to model and provision AWS and third-party 
-application resources in your cloud environment. CloudFormation allows you to use programming 
-languages or a simple text file to model and provision, in an automated and secure manner, 
+# One client (and connection pool) for the whole run, shared by concurrent requests.
+# HTTP/2 multiplexes the concurrent probes over one connection, but httpx only
+# negotiates it over TLS; uvicorn speaks HTTP/1.1, so against a bare server this
+# falls back to the keep-alive pool. Put an HTTP/2 proxy (nginx, hypercorn) in front to use it.
+CLIENT_HTTP2 = True
+CLIENT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=30)
+CLIENT_TIMEOUT = httpx.Timeout(60.0)
+
+# Sample document about AWS, uploaded from memory rather than a file on disk
+SAMPLE_DOC_BYTES = b"""
+AWS CloudFormation provides a common language to model and provision AWS and third-party
+application resources in your cloud environment. CloudFormation allows you to use programming
+languages or a simple text file to model and provision, in an automated and secure manner,
 all the resources needed for your applications across all regions and accounts.
 
 Key benefits include:
@@ -53,71 +31,107 @@ Key benefits include:
 3. Dependency management
 4. Rollback on failure
 5. Version control capability
-        """)
-    
-    # Send the document for processing
-    with open("sample_doc.txt", "rb") as f:
-        files = {"file": ("sample_doc.txt", f)}
-        response = requests.post(url, files=files)
-        
-        if response.status_code == 200:
-            print(f"Response: {response.json()}")
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
-
-def test_qa():
+"""
+
+async def stream_response(client: httpx.AsyncClient, url: str, payload: dict) -> str:
+    """
+    POST with stream=true and read the server-sent events as they arrive,
+    returning the full text. Raises httpx.HTTPStatusError on an error status.
+    """
+    parts = []
+    async with client.stream("POST", url, params={"stream": "true"}, json=payload) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+
+        event, data = None, []
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data.append(line[len("data: "):])
+            elif not line:
+                # A blank line ends the event
+                text = "\n".join(data)
+                if event == "error":
+                    raise RuntimeError(f"Stream failed: {text}")
+                if event == "done":
+                    break
+                parts.append(text)
+                event, data = None, []
+    return "".join(parts)
+
+CHAT_MESSAGES = [
+    "Can you explain AWS Lambda in simple terms?",
+    "What are some common use cases for AWS Lambda?",
+    "What are the main limitations or constraints of AWS Lambda I should be aware of?"
+]
+
+QA_QUESTIONS = [
+    "What is AWS CloudFormation and what does it do?",
+    "What are the key benefits of CloudFormation?",
+    "What happens when a CloudFormation deployment fails?"
+]
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client():
+    async with httpx.AsyncClient(
+        base_url=BASE_URL, http2=CLIENT_HTTP2, limits=CLIENT_LIMITS, timeout=CLIENT_TIMEOUT
+    ) as c:
+        try:
+            await c.get("/health")
+        except httpx.ConnectError:
+            pytest.skip(f"No server running at {BASE_URL}")
+        yield c
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def document_index(client: httpx.AsyncClient) -> str:
+    """Upload the sample document once and return its id for the QA tests"""
+    files = {"file": ("sample_doc.txt", SAMPLE_DOC_BYTES, "text/plain")}
+    response = await client.post("/upload", files=files)
+    assert response.status_code == 200, response.text
+    return orjson.loads(response.content)["document_index"]
+
+@pytest.fixture
+def stream_chat(client: httpx.AsyncClient):
+    # Bind the client and URL once; each call only supplies the payload
+    return functools.partial(stream_response, client, "/chat")
+
+@pytest.fixture
+def stream_qa(client: httpx.AsyncClient):
+    return functools.partial(stream_response, client, "/qa")
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("message", CHAT_MESSAGES)
+async def test_chat(stream_chat, message: str):
+    """
+    Test the chat endpoint, which answers each message with Claude. The messages
+    are independent requests, so this does not check context retention.
     """
-    Test the QA endpoint which uses Claude via LangChain's QA chain to:
-    1. Process specific questions about given contexts
-    2. Generate relevant and accurate answers
+    text = await stream_chat({"message": message})
+    assert text.strip()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_document_upload(client: httpx.AsyncClient):
+    """
+    Test the upload endpoint, which stores the document and returns its id
+    """
+    files = {"file": ("sample_doc.txt", SAMPLE_DOC_BYTES, "text/plain")}
+    response = await client.post("/upload", files=files)
+
+    assert response.status_code == 200
+    data = orjson.loads(response.content)
+    assert data["document_index"]
+    assert data["message"] == "Document processed successfully"
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("question", QA_QUESTIONS)
+async def test_qa(stream_qa, document_index: str, question: str):
     """
-    print("\n=== Testing QA Endpoint with Claude ===")
-    url = f"{BASE_URL}/qa"
-    
-    # Test context and questions about AWS
-    context = """
-    Amazon ECS (Elastic Container Service) is a fully managed container orchestration service 
-    that helps you easily deploy, manage, and scale containerized applications. It deeply 
-    integrates with the rest of the AWS platform to provide a secure and easy-to-use 
-    solution for running container workloads in the cloud and now on your infrastructure 
-    with ECS Anywhere.
-
-    ECS features include Fargate for serverless compute for containers, deep integration 
-    with AWS IAM for security, AWS VPC for networking, and AWS CloudWatch for monitoring.
+    Test the QA endpoint, which answers questions about an uploaded document with Claude
     """
-    
-    questions = [
-        "What is Amazon ECS and what does it do?",
-        "What are the key features of ECS?",
-        "How does ECS integrate with other AWS services?"
-    ]
-    
-    for question in questions:
-        payload = {
-            "question": question,
-            "context": context
-        }
-        print(f"\nAsking: {question}")
-        response = requests.post(url, json=payload)
-        
-        if response.status_code == 200:
-            print(f"Response: {response.json()['response']}")
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
+    text = await stream_qa({"question": question, "document_index": document_index})
+    assert text.strip()
 
 if __name__ == "__main__":
-    print("Starting endpoint tests with Claude...")
-    
-    try:
-        # Test basic connectivity
-        requests.get(f"{BASE_URL}/health")
-        
-        # Run tests
-        test_chat()
-        test_document_processing()
-        test_qa()
-        
-    except requests.exceptions.ConnectionError:
-        print("Error: Could not connect to the server. Make sure it's running on http://localhost:8000")
-    except Exception as e:
-        print(f"Error occurred: {str(e)}")
+    pytest.main([__file__, "-v"])
@@ -1,22 +1,37 @@
 import os
 import sys
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
+import httpx
+from httpx import ASGITransport
 from unittest.mock import patch, Mock, AsyncMock
-import tempfile
-from fastapi import FastAPI
+from types import SimpleNamespace
 import pytest_asyncio
-from anthropic import APIError, APIConnectionError, APITimeoutError
 
 # Add the services directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import after path setup
-from main import app
+@pytest.fixture(scope="session")
+def app():
+    # Import the app (and anthropic, LangChain, ...) when the first test runs, not at collection
+    from main import app as _app
+    return _app
 
-# Create test client
-client = TestClient(app=app)
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client(app):
+    # One app and client for the whole session, driven in-process with no sync bridge thread.
+    # ASGITransport doesn't send lifespan events, so enter the lifespan here, exactly once.
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            yield c
+
+@pytest.fixture(autouse=True)
+def clear_response_caches(app):
+    # Tests reuse the same prompt, so don't let one test's answer leak into the next
+    from main import response_caches
+    for cache in response_caches.values():
+        cache.clear()
 
 # Mock environment variables
 os.environ["ANTHROPIC_API_KEY"] = "test_key"
@@ -37,27 +52,31 @@ class MockAPITimeoutError(Exception):
         self.message = message
         super().__init__(message)
 
-def test_root():
-    response = client.get("/")
+def _make_ok_message(text="Test response"):
+    # A successful Claude message; content blocks are plain namespaces, not Mocks
+    message = AsyncMock()
+    message.content = [SimpleNamespace(text=text)]
+    return message
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_root(client):
+    response = await client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Stock Recommendation System API"}
 
-def test_health_check():
-    response = client.get("/health")
+@pytest.mark.asyncio(loop_scope="session")
+async def test_health_check(client):
+    response = await client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
-@pytest.mark.asyncio
-async def test_chat_endpoint():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_chat_endpoint(client):
     # Mock the Anthropic response
-    mock_content = [Mock()]
-    mock_content[0].text = "Test response"
-    mock_message = AsyncMock()
-    mock_message.content = mock_content
-    mock_create = AsyncMock(return_value=mock_message)
+    mock_create = AsyncMock(return_value=_make_ok_message())
     
     with patch('main.anthropic.messages.create', mock_create):
-        response = client.post(
+        response = await client.post(
             "/chat",
             json={"message": "Test message"}
         )
@@ -67,63 +86,38 @@ async def test_chat_endpoint():
         assert data["status"] == "success"
         mock_create.assert_awaited_once()
 
-@pytest.mark.asyncio
-async def test_chat_endpoint_api_error():
-    # Mock an API error response
-    mock_create = AsyncMock(side_effect=MockAPIError("API Error"))
-    
-    with patch('main.anthropic.messages.create', mock_create), \
-         patch('main.APIError', MockAPIError):
-        response = client.post(
-            "/chat",
-            json={"message": "Test message"}
-        )
-        assert response.status_code == 500
-        data = response.json()
-        assert data["detail"]["detail"] == "AI service error: API Error"
-        assert data["detail"]["error_type"] == "api_error"
-        assert data["detail"]["status"] == "error"
-        mock_create.assert_awaited_once()
-
-@pytest.mark.asyncio
-async def test_chat_endpoint_connection_error():
-    # Mock a connection error
-    mock_create = AsyncMock(side_effect=MockAPIConnectionError("Connection Error"))
-    
-    with patch('main.anthropic.messages.create', mock_create), \
-         patch('main.APIConnectionError', MockAPIConnectionError):
-        response = client.post(
-            "/chat",
-            json={"message": "Test message"}
-        )
-        assert response.status_code == 503
-        data = response.json()
-        assert data["detail"]["detail"] == "Unable to connect to AI service. Please try again later."
-        assert data["detail"]["error_type"] == "connection_error"
-        assert data["detail"]["status"] == "error"
-        mock_create.assert_awaited_once()
+# (exception, patched name in main, status, error_type, detail) for each error path
+ERROR_CASES = [
+    (MockAPIError, "APIError", 500, "api_error", "AI service error: API Error"),
+    (MockAPIConnectionError, "APIConnectionError", 503, "connection_error",
+     "Unable to connect to AI service. Please try again later."),
+    (MockAPITimeoutError, "APITimeoutError", 504, "timeout_error",
+     "Request timed out. Please try again."),
+]
 
-@pytest.mark.asyncio
-async def test_chat_endpoint_timeout_error():
-    # Mock a timeout error
-    mock_create = AsyncMock(side_effect=MockAPITimeoutError("Timeout Error"))
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("exc_cls,patch_name,status,err_type,detail", ERROR_CASES)
+async def test_chat_endpoint_error(client, exc_cls, patch_name, status, err_type, detail):
+    # Mock the Anthropic call raising the given error
+    mock_create = AsyncMock(side_effect=exc_cls("API Error"))
     
     with patch('main.anthropic.messages.create', mock_create), \
-         patch('main.APITimeoutError', MockAPITimeoutError):
-        response = client.post(
+         patch(f'main.{patch_name}', exc_cls):
+        response = await client.post(
             "/chat",
             json={"message": "Test message"}
         )
-        assert response.status_code == 504
+        assert response.status_code == status
         data = response.json()
-        assert data["detail"]["detail"] == "Request timed out. Please try again."
-        assert data["detail"]["error_type"] == "timeout_error"
+        assert data["detail"]["detail"] == detail
+        assert data["detail"]["error_type"] == err_type
         assert data["detail"]["status"] == "error"
         mock_create.assert_awaited_once()
 
-def test_chat_endpoint_invalid_request():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_chat_endpoint_invalid_request(client):
     # Test with empty message
-    response = client.post(
+    response = await client.post(
         "/chat",
         json={"message": ""}
     )
@@ -131,11 +125,157 @@ def test_chat_endpoint_invalid_request():
     assert "message cannot be empty" in str(response.json()["detail"])
 
     # Test with missing message field
-    response = client.post(
+    response = await client.post(
         "/chat",
         json={}
     )
     assert response.status_code == 422
 
+SAMPLE_DOC = b"AWS CloudFormation models and provisions cloud resources as code."
+
+class _FakeStream:
+    # Stands in for anthropic.messages.stream(...): an async context manager with a text_stream
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        async def chunks():
+            for chunk in self.chunks:
+                yield chunk
+        return chunks()
+
+async def _upload(client, content=SAMPLE_DOC):
+    response = await client.post("/upload", files={"file": ("doc.txt", content, "text/plain")})
+    assert response.status_code == 200
+    return response.json()["document_index"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_upload_then_qa(client):
+    document_index = await _upload(client)
+    mock_create = AsyncMock(return_value=_make_ok_message("It provisions resources."))
+    
+    with patch('main.anthropic.messages.create', mock_create):
+        response = await client.post(
+            "/qa",
+            json={"question": "What does it do?", "document_index": document_index}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"response": "It provisions resources.", "status": "success"}
+        mock_create.assert_awaited_once()
+        # The uploaded text is what Claude was asked about
+        content = mock_create.await_args.kwargs["messages"][0]["content"]
+        assert SAMPLE_DOC.decode() in content[0]["text"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_upload_is_deduplicated(client):
+    first = await _upload(client)
+    second = await _upload(client)
+    assert isinstance(first, str)
+    assert first == second
+    assert await _upload(client, b"A different document.") != first
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_unknown_document(client):
+    response = await client.post(
+        "/qa",
+        json={"question": "What does it do?", "document_index": "unknown"}
+    )
+    assert response.status_code == 404
+    assert "unknown" in response.json()["detail"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_stream(client):
+    document_index = await _upload(client)
+    mock_stream = Mock(return_value=_FakeStream(["It provisions", " resources.\nAs code."]))
+    
+    with patch('main.anthropic.messages.stream', mock_stream):
+        response = await client.post(
+            "/qa",
+            params={"stream": "true"},
+            json={"question": "What does it do?", "document_index": document_index}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        # One event per chunk, multi-line chunks split over data lines, then the done event
+        assert response.text == (
+            "data: It provisions\n\n"
+            "data:  resources.\n"
+            "data: As code.\n\n"
+            "event: done\n"
+            "data: \n\n"
+        )
+        mock_stream.assert_called_once()
+
+QA_QUESTIONS = ["What is it?", "Who uses it?", "Why does it fail?"]
+
+def _qa_reply(batch_reply):
+    # Batched prompts get batch_reply (or raise it); single-question prompts echo their question
+    async def reply(prompt, endpoint):
+        text = prompt[-1]["text"]
+        if text.startswith("Answer each question"):
+            if isinstance(batch_reply, Exception):
+                raise batch_reply
+            return batch_reply
+        return "solo: " + text.split("\n")[0][len("Question: "):]
+    return AsyncMock(side_effect=reply)
+
+async def _ask_all(batcher, questions):
+    return await asyncio.gather(
+        *(batcher.ask("doc", "Document text", question) for question in questions),
+        return_exceptions=True
+    )
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_batcher_full_batch(app):
+    from main import QABatcher
+    mock_create = _qa_reply('["It is a service.", "Developers.", "Bad templates."]')
+    
+    with patch('main.cached_messages_create', mock_create):
+        answers = await _ask_all(QABatcher(window=0.01), QA_QUESTIONS)
+    
+    assert answers == ["It is a service.", "Developers.", "Bad templates."]
+    mock_create.assert_awaited_once()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_batcher_partial_batch_falls_back(app):
+    from main import QABatcher
+    # The second answer is missing, so only that question is asked again on its own
+    mock_create = _qa_reply('Here you go:\n["It is a service.", null, "Bad templates."]')
+    
+    with patch('main.cached_messages_create', mock_create):
+        answers = await _ask_all(QABatcher(window=0.01), QA_QUESTIONS)
+    
+    assert answers == ["It is a service.", "solo: Who uses it?", "Bad templates."]
+    assert mock_create.await_count == 2
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_batcher_unparsable_batch_falls_back(app):
+    from main import QABatcher
+    mock_create = _qa_reply("**A1:** It is a service.\n**A2:** Developers.")
+    
+    with patch('main.cached_messages_create', mock_create):
+        answers = await _ask_all(QABatcher(window=0.01), QA_QUESTIONS)
+    
+    assert answers == [f"solo: {question}" for question in QA_QUESTIONS]
+    assert mock_create.await_count == 1 + len(QA_QUESTIONS)
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_qa_batcher_error_reaches_every_caller(app):
+    from main import QABatcher
+    mock_create = _qa_reply(RuntimeError("Claude unavailable"))
+    
+    with patch('main.cached_messages_create', mock_create):
+        answers = await _ask_all(QABatcher(window=0.01), QA_QUESTIONS)
+    
+    assert all(isinstance(answer, RuntimeError) for answer in answers)
+    mock_create.assert_awaited_once()
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])